@@ -1,13 +1,28 @@
+from functools import cache
+
 import environ
 from dotenv import load_dotenv
 
 
+def positive_int(value: str | int) -> int:
+    """Convert a config value to an int, rejecting values below 1"""
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"Expected a positive integer, got {value}")
+    return number
+
+
 @environ.config(prefix="")
 class AppConfig:
     ollama_host: str = environ.var(default="localhost")
     ollama_port: str = environ.var(default="11434")
     ollama_model: str = environ.var(default="qwen3:8b")
+    ollama_max_concurrency: int = environ.var(default=8, converter=positive_int)
+    skip_summary_for_terminal_tools: bool = environ.bool_var(default=False)
 
 
-load_dotenv()
-config = environ.to_config(AppConfig)
+@cache
+def get_config() -> AppConfig:
+    """Load the .env file and build the app config on first use"""
+    load_dotenv()
+    return environ.to_config(AppConfig)
@@ -1,23 +1,52 @@
 import asyncio
 import json
-from contextlib import AsyncExitStack
-
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import AsyncExitStack, asynccontextmanager
+from functools import partial
+from urllib.parse import urlsplit, urlunsplit
+
+import anyio
+import httpx
 import mcp
-from dotenv import load_dotenv
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
-from mcp.types import ListRootsResult, Root
-from ollama import AsyncClient
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, ListRootsResult, Root
+from ollama import AsyncClient, Message, ResponseError
 from pydantic import FileUrl
 
-from appconfig import config
+from appconfig import get_config
+
+cfg = get_config()
+
+OLLAMA_HOST = cfg.ollama_host
+OLLAMA_PORT = cfg.ollama_port
+OLLAMA_MODEL = cfg.ollama_model
+OLLAMA_MAX_CONCURRENCY = cfg.ollama_max_concurrency
+SKIP_SUMMARY_FOR_TERMINAL_TOOLS = cfg.skip_summary_for_terminal_tools
+
+logger = logging.getLogger(__name__)
+
+# Errors raised when the MCP session's stream has been closed or dropped
+SESSION_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError)
 
-load_dotenv()  # load environment variables from .env
+# Ollama status codes signalling that it is rate limiting or overloaded
+BACKOFF_STATUS_CODES = (429, 503)
 
-OLLAMA_HOST = config.ollama_host
-OLLAMA_PORT = config.ollama_port
-OLLAMA_MODEL = config.ollama_model
+# Tools whose output is always a complete answer
+TERMINAL_TOOLS = {"count_csv_rows", "count_csv_columns"}
+# Tools whose output is a complete answer when the query asks for the schema or columns
+SCHEMA_TOOLS = {"get_csv_schema", "read_csv_columns"}
+SCHEMA_INTENT_WORDS = ("schema", "column", "dtype", "type")
+
+
+def is_session_error(error: BaseException) -> bool:
+    """Check whether an error means the MCP session's transport is gone"""
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    return isinstance(error, SESSION_ERRORS)
 
 
 def convert_tools_to_ollama_format(tool: mcp.Tool) -> dict:
@@ -29,21 +58,82 @@ def convert_tools_to_ollama_format(tool: mcp.Tool) -> dict:
             "description": tool.description,
             "parameters": {
                 "required": tool.inputSchema["required"],
-                "properties": {
-                    k: {"type": v["type"]}
-                    for k, v in tool.inputSchema["properties"].items()
-                },
+                "properties": tool.inputSchema["properties"],
             },
         },
     }
 
 
+def ollama_host_url(host: str, port: str) -> str:
+    """Add the configured port to a plain http Ollama host that has none,
+    other hosts are passed through for ollama to apply its defaults
+    """
+    parsed = urlsplit(host if "://" in host else f"http://{host}")
+    if parsed.scheme != "http" or not parsed.hostname or parsed.port is not None:
+        return host
+    return urlunsplit(parsed._replace(netloc=f"{parsed.netloc}:{port}"))
+
+
+def _is_terminal_tool_output(tool_name: str, result, query: str) -> bool:
+    """Check whether a tool result already answers the query without an LLM summary"""
+    if isinstance(result, BaseException) or result.isError:
+        return False
+    if tool_name in TERMINAL_TOOLS:
+        return True
+    if tool_name in SCHEMA_TOOLS:
+        return any(word in query.lower() for word in SCHEMA_INTENT_WORDS)
+    return False
+
+
+class ConcurrencyLimiter:
+    """Bound concurrent Ollama requests, shrinking the limit by one on
+    rate-limit or overload responses and restoring it after a cooldown
+    """
+
+    def __init__(self, limit: int, cooldown: float = 5.0):
+        self._semaphore = asyncio.Semaphore(limit)
+        self._limit = limit
+        self._cooldown = cooldown
+        self._withheld = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        await self._semaphore.acquire()
+        release = True
+        try:
+            yield
+        except ResponseError as e:
+            if (
+                e.status_code in BACKOFF_STATUS_CODES
+                and self._withheld < self._limit - 1
+            ):
+                # Keep the permit until the cooldown passes to lower the limit
+                self._withheld += 1
+                release = False
+                asyncio.get_running_loop().call_later(self._cooldown, self._restore)
+            raise
+        finally:
+            if release:
+                self._semaphore.release()
+
+    def _restore(self):
+        self._withheld -= 1
+        self._semaphore.release()
+
+
 class MCPClient:
     def __init__(self, filepath: str = "mcp.json"):
         # Initialize session and client objects
         self.session: ClientSession | None = None
+        self._ollama_tools: list[dict] = []
         self.exit_stack = AsyncExitStack()
-        self.ollama = AsyncClient(host=OLLAMA_HOST)
+        self._reconnect: Callable[[], Awaitable[None]] | None = None
+        # Reuse persistent keep-alive connections across chat calls
+        self.ollama = AsyncClient(
+            host=ollama_host_url(OLLAMA_HOST, OLLAMA_PORT),
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        )
+        self._ollama_limiter = ConcurrencyLimiter(OLLAMA_MAX_CONCURRENCY)
         self.config = self.read_config(filepath)
 
     def read_config(self, filepath: str) -> dict:
@@ -76,6 +166,7 @@ class MCPClient:
         Args:
             url: URL of the SSE server
         """
+        self._reconnect = partial(self.connect_to_sse_server, url)
         sse_transport = await self.exit_stack.enter_async_context(
             sse_client(url, timeout=60)
         )
@@ -91,6 +182,7 @@ class MCPClient:
         # List available tools
         response = await self.session.list_tools()
         tools = response.tools
+        self._ollama_tools = [convert_tools_to_ollama_format(tool) for tool in tools]
         print("\nConnected to server with tools:", [tool.name for tool in tools])
 
     async def connect_to_server(self, server_script_path: str):
@@ -104,6 +196,7 @@ class MCPClient:
         if not (is_python or is_js):
             raise ValueError("Server script must be a .py or .js file")
 
+        self._reconnect = partial(self.connect_to_server, server_script_path)
         command = "python" if is_python else "node"
         server_params = StdioServerParameters(
             command=command, args=[server_script_path], env=None
@@ -122,72 +215,129 @@ class MCPClient:
         # List available tools
         response = await self.session.list_tools()
         tools = response.tools
+        self._ollama_tools = [convert_tools_to_ollama_format(tool) for tool in tools]
         print("\nConnected to server with tools:", [tool.name for tool in tools])
 
-    async def process_query(self, query: str) -> str:
-        """Process a query using Ollama and available tools"""
-        assert self.session is not None, "Not connected to any MCP server"
-        messages = [{"role": "user", "content": query}]
+    async def _ensure_session(self, max_retries: int = 5):
+        """Reconnect to the last MCP server, retrying with exponential backoff
 
-        response = await self.session.list_tools()
+        Args:
+            max_retries: Number of reconnect attempts before giving up
+        """
+        assert self._reconnect is not None, "Not connected to any MCP server"
+        delay = 1.0
+        for attempt in range(1, max_retries + 1):
+            try:
+                await self.exit_stack.aclose()
+            except Exception:
+                pass  # the old transport is already broken
+            self.exit_stack = AsyncExitStack()
+            self.session = None
 
-        ollama_tools = [convert_tools_to_ollama_format(tool) for tool in response.tools]
+            try:
+                await self._reconnect()
+                return
+            except Exception as e:
+                logger.warning("Reconnect attempt %d failed: %s", attempt, e)
+                if attempt < max_retries:
+                    await asyncio.sleep(delay)
+                    delay *= 2
 
-        response = await self.ollama.chat(
-            model=OLLAMA_MODEL, messages=messages, tools=ollama_tools, think=False
-        )
+        raise ConnectionError("Could not reconnect to MCP server")
 
-        # Process response and handle tool calls
-        final_text = []
+    async def process_query(self, query: str) -> AsyncIterator[str]:
+        """Process a query using Ollama and available tools,
+        yielding the response text as it is generated
+        """
+        assert self.session is not None, "Not connected to any MCP server"
+        messages = [{"role": "user", "content": query}]
 
-        message = response.message
-        if message.content:
-            final_text.append(message.content)
+        # Stream content and collect tool calls from the response
+        content = ""
+        tool_calls: list[Message.ToolCall] = []
+        async with self._ollama_limiter.slot():
+            stream = await self.ollama.chat(
+                model=OLLAMA_MODEL,
+                messages=messages,
+                tools=self._ollama_tools,
+                stream=True,
+                think=False,
+            )
+            async for chunk in stream:
+                if chunk.message.content:
+                    content += chunk.message.content
+                    yield chunk.message.content
+                if chunk.message.tool_calls:
+                    tool_calls.extend(chunk.message.tool_calls)
+
+        if not content and tool_calls:
+            # Execute all tool calls concurrently
+            results = await asyncio.gather(
+                *[
+                    self.session.call_tool(tool.function.name, tool.function.arguments)  # type: ignore
+                    for tool in tool_calls
+                ],
+                return_exceptions=True,
+            )
+            # A dropped session fails every call, let the caller reconnect
+            for result in results:
+                if is_session_error(result):
+                    raise result
 
-        elif message.tool_calls:
-            tool_name = ""
-            result = None
-            for tool in message.tool_calls:
+            # Continue conversation with tool results
+            for tool, result in zip(tool_calls, results):
                 tool_name = tool.function.name
                 tool_args = tool.function.arguments
-
-                # Execute tool call
-                result = await self.session.call_tool(tool_name, tool_args)  # type: ignore
-                final_text.append(f"[Calling tool {tool_name} with args {tool_args}]")
-
-            # Continue conversation with tool results
-            if message.content:
-                messages.append({"role": "assistant", "content": message.content})
-            if result is None:
-                raise ValueError("Error doing tool call")
-            if result.structuredContent is not None:
-                messages.append(
-                    {
-                        "role": "tool",
-                        "content": str(result.structuredContent["result"]),
-                        "tool_name": tool_name,
-                    }
-                )
-
-            elif isinstance(result.content[0], mcp.types.TextContent):
-                messages.append(
-                    {
-                        "role": "tool",
-                        "content": result.content[0].text,
-                        "tool_name": tool_name,
-                    }
+                yield f"[Calling tool {tool_name} with args {tool_args}]\n"
+
+                if isinstance(result, BaseException):
+                    # Report the failure to the model instead of dropping the other results
+                    messages.append(
+                        {
+                            "role": "tool",
+                            "content": f"Error calling tool {tool_name}: {result}",
+                            "tool_name": tool_name,
+                        }
+                    )
+
+                elif result.structuredContent is not None:
+                    messages.append(
+                        {
+                            "role": "tool",
+                            "content": str(result.structuredContent["result"]),
+                            "tool_name": tool_name,
+                        }
+                    )
+
+                elif isinstance(result.content[0], mcp.types.TextContent):
+                    messages.append(
+                        {
+                            "role": "tool",
+                            "content": result.content[0].text,
+                            "tool_name": tool_name,
+                        }
+                    )
+                else:
+                    raise ValueError("Unsupported content type from tool")
+
+            if SKIP_SUMMARY_FOR_TERMINAL_TOOLS and all(
+                _is_terminal_tool_output(tool.function.name, result, query)
+                for tool, result in zip(tool_calls, results)
+            ):
+                # The raw tool output already answers the query
+                for message in messages:
+                    if message["role"] == "tool":
+                        yield message["content"] + "\n"
+                return
+
+            logger.debug("Messages: %s", messages)
+            async with self._ollama_limiter.slot():
+                stream = await self.ollama.chat(
+                    model=OLLAMA_MODEL, messages=messages, stream=True, think=False
                 )
-            else:
-                raise ValueError("Unsupported content type from tool")
-
-            print("Messages:", messages)
-            response = await self.ollama.chat(
-                model=OLLAMA_MODEL, messages=messages, think=False
-            )
-
-            final_text.append(response.message.content)
-
-        return "\n".join(final_text)
+                async for chunk in stream:
+                    if chunk.message.content:
+                        yield chunk.message.content
 
     async def chat_loop(self):
         """Run an interactive chat loop"""
@@ -201,11 +351,21 @@ class MCPClient:
                 if query.lower() == "quit":
                     break
 
-                response = await self.process_query(query)
-                print("\n" + response)
+                print()
+                async for text in self.process_query(query):
+                    print(text, end="", flush=True)
+                print()
 
             except Exception as e:
-                print(f"\nError: {str(e)}")
+                if not is_session_error(e):
+                    print(f"\nError: {str(e)}")
+                    continue
+
+                logger.warning("Connection lost: %s, reconnecting...", e)
+                try:
+                    await self._ensure_session()
+                except ConnectionError as e:
+                    print(f"\nError: {str(e)}")
 
     async def cleanup(self):
         """Clean up resources"""
@@ -223,4 +383,5 @@ async def main():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
     asyncio.run(main())
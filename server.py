@@ -1,5 +1,9 @@
 import argparse
+import asyncio
+import logging
+import os
 import sys
+from functools import lru_cache
 from pathlib import Path
 from typing import Literal
 
@@ -7,10 +11,17 @@ import polars as pl
 from mcp.server.fastmcp import Context, FastMCP
 from mcp.types import ClientCapabilities, RootsCapability
 
+logger = logging.getLogger(__name__)
+
 # Create an MCP server
-mcp = FastMCP("CSVInfo")
+mcp = FastMCP("CSVInfo", log_level="WARNING")
 
 allowed_directories: list[str] | None = None
+# Resolved paths of allowed_directories, used for file lookup
+_allowed_paths: list[Path] = []
+
+# Command line arguments, parsed once at startup
+_ARGS: argparse.Namespace | None = None
 
 
 async def get_directories(ctx: Context) -> list[str]:
@@ -18,7 +29,7 @@ async def get_directories(ctx: Context) -> list[str]:
     use list root callback if the client is capable,
     Otherwise fall back to cli arguments
     """
-    global allowed_directories
+    global allowed_directories, _allowed_paths
 
     if allowed_directories is not None:
         return allowed_directories
@@ -32,12 +43,13 @@ async def get_directories(ctx: Context) -> list[str]:
         if len(dirs) == 0:
             raise ValueError("No root directories available from client.")
         allowed_directories = dirs
+        _allowed_paths = [Path(d).resolve() for d in allowed_directories]
 
         return allowed_directories
 
-    args = parse_args()
-    if args.root_directory is not None:
-        allowed_directories = [args.root_directory[0]]
+    if _ARGS is not None and _ARGS.root_directory is not None:
+        allowed_directories = [_ARGS.root_directory[0]]
+        _allowed_paths = [Path(d).resolve() for d in allowed_directories]
         return allowed_directories
 
     raise ValueError(
@@ -45,19 +57,48 @@ async def get_directories(ctx: Context) -> list[str]:
     )
 
 
-def find_file_in_allowed_dirs(file_path: str, allowed_dirs: list[str]) -> str | None:
+def find_file_in_allowed_dirs(file_path: str) -> str | None:
     """Search for the file in the allowed directories and return its full path if found."""
-    for dir in allowed_dirs:
-        potential_path = Path(dir) / file_path
-        if potential_path.exists() and potential_path.is_file():
+    for dir in _allowed_paths:
+        potential_path = dir / file_path
+        if potential_path.is_file():
             return str(potential_path)
     return None
 
 
-def read_csv(file_path: str) -> pl.DataFrame:
-    """Reads a csv into a polars dataframe"""
-    df = pl.read_csv(str(file_path))
-    return df
+def scan_csv(file_path: str) -> pl.LazyFrame:
+    """Lazily scan a csv so polars can process it in bounded-memory chunks,
+    call .collect(engine="streaming") when a materialized frame is needed
+    """
+    return pl.scan_csv(str(file_path), low_memory=True)
+
+
+@lru_cache(maxsize=64)
+def _cached_schema(file_path: str, mtime_ns: int, size: int) -> pl.Schema:
+    """Read the header of a csv, memoized on path, modification time and size"""
+    return scan_csv(file_path).collect_schema()
+
+
+def read_csv_schema(file_path: str) -> pl.Schema:
+    """Read only the header of a csv to get its column names and dtypes,
+    reusing the schema while the file is unchanged on disk
+    """
+    st = os.stat(file_path)
+    return _cached_schema(str(file_path), st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=32)
+def _cached_row_count(file_path: str, mtime_ns: int, size: int) -> int:
+    """Count rows with a streaming scan, memoized on path, modification time and size"""
+    return scan_csv(file_path).select(pl.len()).collect(engine="streaming").item()
+
+
+def count_rows(file_path: str) -> int:
+    """Count the rows of a csv without materializing it,
+    reusing the count while the file is unchanged on disk
+    """
+    st = os.stat(file_path)
+    return _cached_row_count(str(file_path), st.st_mtime_ns, st.st_size)
 
 
 @mcp.tool()
@@ -65,11 +106,11 @@ async def get_csv_schema(file_path: str, ctx: Context) -> dict:
     """Get the schema of a CSV file"""
     try:
         dirs = await get_directories(ctx)
-        full_file_path = find_file_in_allowed_dirs(file_path, dirs)
+        full_file_path = find_file_in_allowed_dirs(file_path)
         if full_file_path is None:
             raise ValueError(f"File not found in allowed directories: {dirs}")
-        df = read_csv(full_file_path)
-        schema = {col: str(dtype) for col, dtype in df.schema.items()}
+        csv_schema = await asyncio.to_thread(read_csv_schema, full_file_path)
+        schema = {col: str(dtype) for col, dtype in csv_schema.items()}
         return schema
     except Exception as e:
         raise ValueError(f"Error getting CSV schema: {e}")
@@ -80,11 +121,11 @@ async def count_csv_columns(file_path: str, ctx: Context) -> int:
     """Count the number of columns in a CSV file"""
     try:
         dirs = await get_directories(ctx)
-        full_file_path = find_file_in_allowed_dirs(file_path, dirs)
+        full_file_path = find_file_in_allowed_dirs(file_path)
         if full_file_path is None:
             raise ValueError(f"File not found in allowed directories: {dirs}")
-        df = read_csv(full_file_path)
-        return len(df.columns)
+        csv_schema = await asyncio.to_thread(read_csv_schema, full_file_path)
+        return len(csv_schema)
     except Exception as e:
         raise ValueError(f"Error counting CSV rows: {e}")
 
@@ -94,11 +135,10 @@ async def count_csv_rows(file_path: str, ctx: Context) -> int:
     """Count the number of rows in a CSV file"""
     try:
         dirs = await get_directories(ctx)
-        full_file_path = find_file_in_allowed_dirs(file_path, dirs)
+        full_file_path = find_file_in_allowed_dirs(file_path)
         if full_file_path is None:
             raise ValueError(f"File not found in allowed directories: {dirs}")
-        df = read_csv(full_file_path)
-        return len(df)
+        return await asyncio.to_thread(count_rows, full_file_path)
     except Exception as e:
         raise ValueError(f"Error counting CSV rows: {e}")
 
@@ -108,11 +148,11 @@ async def read_csv_columns(file_path: str, ctx: Context) -> list[str]:
     """Read a CSV file and return its column names"""
     try:
         dirs = await get_directories(ctx)
-        full_file_path = find_file_in_allowed_dirs(file_path, dirs)
+        full_file_path = find_file_in_allowed_dirs(file_path)
         if full_file_path is None:
             raise ValueError(f"File not found in allowed directories: {dirs}")
-        df = read_csv(full_file_path)
-        return df.columns
+        csv_schema = await asyncio.to_thread(read_csv_schema, full_file_path)
+        return csv_schema.names()
     except Exception as e:
         raise ValueError(f"Error reading CSV file: {e}")
 
@@ -160,12 +200,13 @@ def main(transport: Literal["stdio", "sse", "streamable-http"]):
 
 
 if __name__ == "__main__":
-    args = parse_args()
+    _ARGS = parse_args()
 
-    if args.transport not in ["stdio", "sse", "streamable-http"]:
-        print(
-            f"Error: Unsupported transport '{args.transport}'. Supported transports are 'stdio', 'sse', and 'streamable-http'."
+    if _ARGS.transport not in ["stdio", "sse", "streamable-http"]:
+        logger.error(
+            "Unsupported transport '%s'. Supported transports are 'stdio', 'sse', and 'streamable-http'.",
+            _ARGS.transport,
         )
         sys.exit(1)
 
-    main(args.transport)
+    main(_ARGS.transport)